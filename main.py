@@ -1,17 +1,54 @@
+import asyncio
+import hashlib
+import heapq
+import io
 import os
 import random
+import tempfile
+from contextlib import asynccontextmanager
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional
 
 import httpx
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import FileResponse, JSONResponse
+import orjson
+from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Query, Request
+from fastapi.responses import (
+    JSONResponse,
+    ORJSONResponse,
+    Response,
+    StreamingResponse,
+)
 from PIL import Image, ImageDraw, ImageFont
 from pydantic import BaseModel
-from sqlalchemy import Column, DateTime, Float, Integer, String, create_engine, func
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Float,
+    Index,
+    Integer,
+    String,
+    create_engine,
+    func,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.schema import CreateIndex
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter,
+)
+
+from src.cache import cache_key, get_cached, invalidate, set_cached
+from src.database import add_missing_columns
+from src.models import API_STATUS_ID, ApiStatus
 
 # Environment variables
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./countries.db")
@@ -20,7 +57,16 @@ if DATABASE_URL.startswith("postgres://"):
     DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
 
 # Database setup
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Connections are recycled and probed in the background (see ping_database) rather
+# than pinged on every checkout
+engine = create_engine(
+    DATABASE_URL,
+    pool_recycle=1800,
+    pool_size=10,
+    max_overflow=20,
+    pool_reset_on_return="rollback",
+    query_cache_size=1200,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -29,7 +75,7 @@ Base = declarative_base()
 class CountryModel(Base):
     __tablename__ = "countries"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     name = Column(String(255), unique=True, nullable=False, index=True)
     capital = Column(String(255), nullable=True)
     region = Column(String(100), nullable=True, index=True)
@@ -38,13 +84,55 @@ class CountryModel(Base):
     exchange_rate = Column(Float, nullable=True)
     estimated_gdp = Column(Float, nullable=True)
     flag_url = Column(String(500), nullable=True)
+    # Random GDP multiplier drawn once per country, shared with the refresh script
+    gdp_factor = Column(Float, nullable=True)
     last_refreshed_at = Column(
         DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
     )
 
+    __table_args__ = (
+        # Case-insensitive uniqueness, used as the ON CONFLICT target on refresh
+        Index("ix_countries_lower_name", func.lower(name), unique=True),
+        # Expression indexes matching the case-insensitive lookups and filters
+        Index("ix_countries_lower_region", func.lower(region)),
+        Index("ix_countries_lower_currency_code", func.lower(currency_code)),
+    )
+
+
+# Columns exposed by the API, selected as plain rows on read-only paths
+COUNTRY_FIELDS = (
+    CountryModel.id,
+    CountryModel.name,
+    CountryModel.capital,
+    CountryModel.region,
+    CountryModel.population,
+    CountryModel.currency_code,
+    CountryModel.exchange_rate,
+    CountryModel.estimated_gdp,
+    CountryModel.flag_url,
+    CountryModel.last_refreshed_at,
+)
 
 # Create tables
 Base.metadata.create_all(bind=engine)
+add_missing_columns(engine, CountryModel.__table__)
+# create_all skips existing tables, so add indexes introduced since they were created.
+# IF NOT EXISTS rather than checkfirst: SQLite does not reflect expression indexes.
+with engine.begin() as conn:
+    for index in CountryModel.__table__.indexes:
+        conn.execute(CreateIndex(index, if_not_exists=True))
+# The status table is shared with the refresh script, which owns its model
+ApiStatus.__table__.create(bind=engine, checkfirst=True)
+if "total_countries" in add_missing_columns(engine, ApiStatus.__table__):
+    # Backfill the count for a status row written before the column existed
+    with engine.begin() as conn:
+        conn.execute(
+            update(ApiStatus).values(
+                total_countries=select(func.count())
+                .select_from(CountryModel)
+                .scalar_subquery()
+            )
+        )
 
 
 # Pydantic Models
@@ -74,8 +162,47 @@ class ErrorResponse(BaseModel):
     details: Optional[dict] = None
 
 
+DATABASE_PING_INTERVAL = 60
+
+
+def ping_database():
+    """Probe a pooled connection, discarding the pool if the database went away"""
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+    except Exception as e:
+        print(f"Database ping failed, resetting connection pool: {str(e)}")
+        engine.dispose()
+
+
+async def ping_database_periodically():
+    """Run ping_database in a worker thread once per interval"""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(DATABASE_PING_INTERVAL)
+        await loop.run_in_executor(None, ping_database)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Share one HTTP client across refreshes and keep the database pool healthy"""
+    app.state.http = httpx.AsyncClient(
+        timeout=60.0, limits=httpx.Limits(max_connections=32)
+    )
+    ping_task = asyncio.create_task(ping_database_periodically())
+    try:
+        yield
+    finally:
+        ping_task.cancel()
+        await app.state.http.aclose()
+
+
 # FastAPI app
-app = FastAPI(title="Country Currency & Exchange API")
+app = FastAPI(
+    title="Country Currency & Exchange API",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+)
 
 
 def get_db():
@@ -87,83 +214,205 @@ def get_db():
 
 
 # Helper functions
-async def fetch_countries():
+def is_transient_error(exc: BaseException) -> bool:
+    """Timeouts, connection errors, rate limits and 5xx responses are worth retrying"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    return isinstance(exc, httpx.TransportError)
+
+
+_backoff = wait_exponential_jitter(initial=1, max=8)
+
+
+def wait_for_retry(retry_state) -> float:
+    """Honour Retry-After on throttled responses, otherwise back off with jitter"""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError):
+        retry_after = exc.response.headers.get("retry-after", "")
+        if retry_after.isdigit():
+            return min(float(retry_after), 30.0)
+    return _backoff(retry_state)
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_for_retry,
+    retry=retry_if_exception(is_transient_error),
+    reraise=True,
+)
+async def get_json(client: httpx.AsyncClient, url: str):
+    """GET a URL and decode its JSON body, retrying transient failures"""
+    response = await client.get(url)
+    response.raise_for_status()
+    return response.json()
+
+
+async def fetch_countries(client: httpx.AsyncClient):
     """Fetch country data from REST Countries API"""
     url = "https://restcountries.com/v2/all?fields=name,capital,region,population,flag,currencies"
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            response = await client.get(url)
-            response.raise_for_status()
-            return response.json()
-        except httpx.TimeoutException:
-            raise HTTPException(
-                status_code=503,
-                detail={
-                    "error": "External data source unavailable",
-                    "details": "Could not fetch data from REST Countries API: Request timeout",
-                },
-            )
-        except Exception as e:
-            raise HTTPException(
-                status_code=503,
-                detail={
-                    "error": "External data source unavailable",
-                    "details": f"Could not fetch data from REST Countries API: {str(e)}",
-                },
-            )
+    try:
+        return await get_json(client, url)
+    except httpx.TimeoutException:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "error": "External data source unavailable",
+                "details": "Could not fetch data from REST Countries API: Request timeout",
+            },
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "error": "External data source unavailable",
+                "details": f"Could not fetch data from REST Countries API: {str(e)}",
+            },
+        )
 
 
-async def fetch_exchange_rates():
+async def fetch_exchange_rates(client: httpx.AsyncClient):
     """Fetch exchange rates from Exchange Rate API"""
     url = "https://open.er-api.com/v6/latest/USD"
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()
-            return data.get("rates", {})
-        except httpx.TimeoutException:
-            raise HTTPException(
-                status_code=503,
-                detail={
-                    "error": "External data source unavailable",
-                    "details": "Could not fetch data from Exchange Rate API: Request timeout",
-                },
-            )
-        except Exception as e:
-            raise HTTPException(
-                status_code=503,
-                detail={
-                    "error": "External data source unavailable",
-                    "details": f"Could not fetch data from Exchange Rate API: {str(e)}",
-                },
-            )
+    try:
+        data = await get_json(client, url)
+        return data.get("rates", {})
+    except httpx.TimeoutException:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "error": "External data source unavailable",
+                "details": "Could not fetch data from Exchange Rate API: Request timeout",
+            },
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "error": "External data source unavailable",
+                "details": f"Could not fetch data from Exchange Rate API: {str(e)}",
+            },
+        )
 
 
-def calculate_gdp(population: int, exchange_rate: Optional[float]) -> Optional[float]:
+def calculate_gdp(
+    population: int, exchange_rate: Optional[float], gdp_factor: float
+) -> Optional[float]:
     """Calculate estimated GDP"""
     if exchange_rate is None or exchange_rate == 0:
         return None
-    random_multiplier = random.uniform(1000, 2000)
+    # gdp_factor is uniform over [0.5, 1.5), so the multiplier is over [1000, 2000)
+    random_multiplier = 1000 * (gdp_factor + 0.5)
     return (population * random_multiplier) / exchange_rate
 
 
-def generate_summary_image(db: Session):
-    """Generate summary image with country statistics"""
+def upsert_countries(db: Session, records: list):
+    """Insert or update country records in a single statement"""
+    if not records:
+        return
+
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        insert = postgresql.insert
+    elif dialect == "sqlite":
+        insert = sqlite.insert
+    else:
+        # No native upsert: load existing countries once and match them in memory
+        existing = {
+            country.name.lower(): country
+            for country in db.execute(select(CountryModel)).scalars()
+        }
+        for record in records:
+            existing_country = existing.get(record["name"].lower())
+            if existing_country:
+                for key, value in record.items():
+                    setattr(existing_country, key, value)
+            else:
+                db.add(CountryModel(**record))
+        return
+
+    stmt = insert(CountryModel).values(records)
+    # Only overwrite the columns the records carry, leaving the others as stored
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[func.lower(CountryModel.name)],
+        set_={key: stmt.excluded[key] for key in records[0] if key != "name"},
+    )
+    db.execute(stmt)
+
+
+# Rendered summary image as (mtime_ns, bytes, etag). Keyed on the file's mtime so
+# a worker that did not render the image still picks up the latest one.
+IMAGE_CACHE = {}
+# Serialises reloads from disk so a burst of requests after a render reads the file once
+IMAGE_RELOAD_LOCK = asyncio.Lock()
+
+
+def cache_summary_image(data: bytes, mtime_ns: int) -> tuple:
+    """Keep the summary image bytes and their ETag in memory"""
+    entry = (mtime_ns, data, f'"{hashlib.md5(data).hexdigest()}"')
+    IMAGE_CACHE["summary"] = entry
+    return entry
+
+
+@lru_cache(maxsize=8)
+def load_font(path: str, size: int):
+    """Load a TrueType font once per (path, size), falling back to the default"""
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def line_spacing(draw: ImageDraw.ImageDraw, font, pitch: int) -> int:
+    """Spacing that puts multiline_text lines `pitch` pixels apart"""
+    return pitch - draw.textbbox((0, 0), "A", font=font)[3]
+
+
+def write_file_atomically(path: Path, data: bytes) -> int:
+    """Replace a file via a uniquely named temp file, returning the new mtime_ns"""
+    with tempfile.NamedTemporaryFile(
+        dir=path.parent, suffix=".tmp", delete=False
+    ) as tmp:
+        tmp.write(data)
+        tmp.flush()
+        # rename keeps the mtime, and stat on the path could see another writer's file
+        mtime_ns = os.fstat(tmp.fileno()).st_mtime_ns
+    try:
+        os.replace(tmp.name, path)
+    except OSError:
+        os.unlink(tmp.name)
+        raise
+    return mtime_ns
+
+
+def generate_summary_image(
+    total: int, top_countries: list, last_refresh: Optional[datetime]
+):
+    """Generate summary image from statistics already computed by the refresh"""
     # Create cache directory if it doesn't exist
     Path("cache").mkdir(exist_ok=True)
 
-    # Get statistics
-    total = db.query(CountryModel).count()
-    top_countries = (
-        db.query(CountryModel)
-        .filter(CountryModel.estimated_gdp.isnot(None))
-        .order_by(CountryModel.estimated_gdp.desc())
-        .limit(5)
-        .all()
-    )
-
-    last_refresh = db.query(func.max(CountryModel.last_refreshed_at)).scalar()
+    # Day granularity, so the hash below still matches for repeated refreshes of
+    # unchanged data while the drawn date never goes stale
+    refresh_time = last_refresh.strftime("%Y-%m-%d UTC") if last_refresh else "Never"
+
+    # Skip the render when everything drawn is identical to the cached image
+    summary_hash = hashlib.blake2b(
+        orjson.dumps(
+            [
+                total,
+                [(c["name"], c["estimated_gdp"]) for c in top_countries],
+                refresh_time,
+            ]
+        )
+    ).hexdigest()
+    image_path = Path("cache/summary.png")
+    hash_path = Path("cache/summary.hash")
+    if (
+        image_path.exists()
+        and hash_path.exists()
+        and hash_path.read_text() == summary_hash
+    ):
+        return
 
     # Create image
     width, height = 800, 600
@@ -171,20 +420,9 @@ def generate_summary_image(db: Session):
     draw = ImageDraw.Draw(img)
 
     # Try to use a better font, fallback to default
-    try:
-        title_font = ImageFont.truetype(
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 32
-        )
-        header_font = ImageFont.truetype(
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 24
-        )
-        text_font = ImageFont.truetype(
-            "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 18
-        )
-    except:
-        title_font = ImageFont.load_default()
-        header_font = ImageFont.load_default()
-        text_font = ImageFont.load_default()
+    title_font = load_font("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 32)
+    header_font = load_font("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 24)
+    text_font = load_font("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 18)
 
     # Draw content
     y_position = 50
@@ -193,150 +431,212 @@ def generate_summary_image(db: Session):
     draw.text((50, y_position), "Country Data Summary", fill="black", font=title_font)
     y_position += 60
 
-    # Total countries
-    draw.text(
-        (50, y_position), f"Total Countries: {total}", fill="black", font=header_font
-    )
-    y_position += 50
-
-    # Top 5 countries
-    draw.text(
+    # Total countries and top 5 heading, drawn in one call per font
+    draw.multiline_text(
         (50, y_position),
-        "Top 5 Countries by Estimated GDP:",
+        f"Total Countries: {total}\nTop 5 Countries by Estimated GDP:",
         fill="black",
         font=header_font,
+        spacing=line_spacing(draw, header_font, 50),
     )
-    y_position += 40
+    y_position += 50 + 40
 
+    # Top 5 countries
+    lines = []
     for i, country in enumerate(top_countries, 1):
         gdp_formatted = (
-            f"{country.estimated_gdp:,.2f}" if country.estimated_gdp else "N/A"
+            f"{country['estimated_gdp']:,.2f}" if country["estimated_gdp"] else "N/A"
         )
-        text = f"{i}. {country.name}: ${gdp_formatted}"
-        draw.text((70, y_position), text, fill="black", font=text_font)
-        y_position += 35
+        lines.append(f"{i}. {country['name']}: ${gdp_formatted}")
+    draw.multiline_text(
+        (70, y_position),
+        "\n".join(lines),
+        fill="black",
+        font=text_font,
+        spacing=line_spacing(draw, text_font, 35),
+    )
+    y_position += 35 * len(lines)
 
     # Last refresh
     y_position += 30
-    refresh_time = (
-        last_refresh.strftime("%Y-%m-%d %H:%M:%S UTC") if last_refresh else "Never"
-    )
     draw.text(
         (50, y_position), f"Last Refreshed: {refresh_time}", fill="gray", font=text_font
     )
 
-    # Save image
-    img.save("cache/summary.png")
+    # Encode in memory; the files on disk are a backup for other workers/restarts
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG", optimize=False, compress_level=1)
+    data = buffer.getvalue()
 
+    # Save the image, then its hash, so the hash never describes an image that was
+    # not written
+    mtime_ns = write_file_atomically(image_path, data)
+    write_file_atomically(hash_path, summary_hash.encode())
+
+    cache_summary_image(data, mtime_ns)
 
-# API Endpoints
-@app.post("/countries/refresh")
-async def refresh_countries():
-    """Fetch and cache all countries with exchange rates"""
-    db = next(get_db())
 
+def refresh_summary_image(
+    total: int, top_countries: list, last_refresh: Optional[datetime]
+):
+    """Regenerate the summary image, logging failures (run as a background task)"""
     try:
-        # Fetch data from external APIs
-        print("Fetching countries data...")
-        countries_data = await fetch_countries()
-        print(f"Fetched {len(countries_data)} countries")
+        generate_summary_image(total, top_countries, last_refresh)
+        print("Generated summary image")
+    except Exception as e:
+        print(f"Error generating image: {str(e)}")
 
-        print("Fetching exchange rates...")
-        exchange_rates = await fetch_exchange_rates()
-        print(f"Fetched {len(exchange_rates)} exchange rates")
 
-        refresh_timestamp = datetime.utcnow()
-        processed = 0
-
-        for country_data in countries_data:
-            try:
-                name = country_data.get("name")
-                if not name:
-                    continue
-
-                population = country_data.get("population", 0)
-                if not population:
-                    continue
-
-                # Handle currency
-                currencies = country_data.get("currencies", [])
-                currency_code = None
-                exchange_rate = None
-                estimated_gdp = None
-
-                if currencies and len(currencies) > 0:
-                    currency_code = currencies[0].get("code")
-
-                    if currency_code and currency_code in exchange_rates:
-                        exchange_rate = exchange_rates[currency_code]
-                        estimated_gdp = calculate_gdp(population, exchange_rate)
-
-                # If no currency, set GDP to 0
-                if not currency_code:
-                    estimated_gdp = 0
-
-                # Check if country exists
-                existing_country = (
-                    db.query(CountryModel)
-                    .filter(func.lower(CountryModel.name) == name.lower())
-                    .first()
-                )
-
-                if existing_country:
-                    # Update existing
-                    existing_country.capital = country_data.get("capital")
-                    existing_country.region = country_data.get("region")
-                    existing_country.population = population
-                    existing_country.currency_code = currency_code
-                    existing_country.exchange_rate = exchange_rate
-                    existing_country.estimated_gdp = estimated_gdp
-                    existing_country.flag_url = country_data.get("flag")
-                    existing_country.last_refreshed_at = refresh_timestamp
-                else:
-                    # Insert new
-                    new_country = CountryModel(
-                        name=name,
-                        capital=country_data.get("capital"),
-                        region=country_data.get("region"),
-                        population=population,
-                        currency_code=currency_code,
-                        exchange_rate=exchange_rate,
-                        estimated_gdp=estimated_gdp,
-                        flag_url=country_data.get("flag"),
-                        last_refreshed_at=refresh_timestamp,
-                    )
-                    db.add(new_country)
-
-                processed += 1
-
-            except Exception as e:
-                print(
-                    f"Error processing country {country_data.get('name', 'unknown')}: {str(e)}"
-                )
-                continue
+def load_gdp_factors() -> dict:
+    """Stored GDP multipliers keyed by lowercased name (blocking, run in a thread)"""
+    db = SessionLocal()
 
-        db.commit()
-        print(f"Committed {processed} countries to database")
+    try:
+        return dict(
+            db.execute(
+                select(func.lower(CountryModel.name), CountryModel.gdp_factor)
+            ).all()
+        )
+    finally:
+        db.close()
+
+
+def build_country_records(
+    countries_data: list,
+    exchange_rates: dict,
+    gdp_factors: dict,
+    refresh_timestamp: datetime,
+) -> dict:
+    """Build upsert records from the external API payloads, keyed by lowercased name"""
+    # Keyed on lowercased name so duplicates collapse before the upsert
+    records = {}
+    # Normalise currency codes once so lookups aren't case-sensitive
+    rates = {code.upper(): rate for code, rate in exchange_rates.items()}
 
-        # Generate summary image
+    for country_data in countries_data:
         try:
-            generate_summary_image(db)
-            print("Generated summary image")
+            name = country_data.get("name")
+            if not name:
+                continue
+
+            population = country_data.get("population", 0)
+            if not population:
+                continue
+
+            # Handle currency
+            currencies = country_data.get("currencies")
+            currency_code = currencies[0].get("code") if currencies else None
+            exchange_rate = rates.get(currency_code.upper()) if currency_code else None
+            estimated_gdp = None
+
+            # Reuse the country's multiplier so unchanged inputs give an unchanged GDP
+            gdp_factor = gdp_factors.get(name.lower())
+            if gdp_factor is None:
+                gdp_factor = 0.5 + random.random()
+
+            if exchange_rate is not None:
+                estimated_gdp = calculate_gdp(population, exchange_rate, gdp_factor)
+
+            # If no currency, set GDP to 0
+            if not currency_code:
+                estimated_gdp = 0
+
+            records[name.lower()] = {
+                "name": name,
+                "capital": country_data.get("capital"),
+                "region": country_data.get("region"),
+                "population": population,
+                "currency_code": currency_code,
+                "exchange_rate": exchange_rate,
+                "estimated_gdp": estimated_gdp,
+                "gdp_factor": gdp_factor,
+                "flag_url": country_data.get("flag"),
+                "last_refreshed_at": refresh_timestamp,
+            }
+
         except Exception as e:
-            print(f"Error generating image: {str(e)}")
+            print(
+                f"Error processing country {country_data.get('name', 'unknown')}: {str(e)}"
+            )
+            continue
+
+    return records
+
+
+def persist_countries(records: dict, refresh_timestamp: datetime) -> int:
+    """Upsert the records and return the new country count (blocking, run in a thread)"""
+    db = SessionLocal()
+
+    try:
+        upsert_countries(db, list(records.values()))
+        total = db.execute(
+            select(func.count()).select_from(CountryModel)
+        ).scalar_one()
+        db.merge(
+            ApiStatus(
+                id=API_STATUS_ID,
+                last_updated=refresh_timestamp,
+                total_countries=total,
+            )
+        )
+        db.commit()
+        return total
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+# API Endpoints
+@app.post("/countries/refresh")
+async def refresh_countries(request: Request, background_tasks: BackgroundTasks):
+    """Fetch and cache all countries with exchange rates"""
+    try:
+        # Fetch data from both external APIs concurrently, loading the stored
+        # GDP multipliers alongside
+        print("Fetching countries data and exchange rates...")
+        client = request.app.state.http
+        loop = asyncio.get_running_loop()
+        countries_data, exchange_rates, gdp_factors = await asyncio.gather(
+            fetch_countries(client),
+            fetch_exchange_rates(client),
+            loop.run_in_executor(None, load_gdp_factors),
+        )
+        print(f"Fetched {len(countries_data)} countries")
+        print(f"Fetched {len(exchange_rates)} exchange rates")
+
+        refresh_timestamp = datetime.utcnow()
+        records = build_country_records(
+            countries_data, exchange_rates, gdp_factors, refresh_timestamp
+        )
 
-        total = db.query(CountryModel).count()
+        # Keep the blocking database work off the event loop
+        total = await loop.run_in_executor(
+            None, persist_countries, records, refresh_timestamp
+        )
+        invalidate()
+        print(f"Committed {len(records)} countries to database")
+
+        # Generate summary image after the response has been sent, reusing the
+        # records just written instead of querying them back
+        top_countries = heapq.nlargest(
+            5,
+            (r for r in records.values() if r["estimated_gdp"] is not None),
+            key=lambda r: r["estimated_gdp"],
+        )
+        background_tasks.add_task(
+            refresh_summary_image, total, top_countries, refresh_timestamp
+        )
         return {
             "message": "Countries refreshed successfully",
             "total_countries": total,
-            "last_refreshed_at": refresh_timestamp.isoformat(),
+            "last_refreshed_at": refresh_timestamp,
         }
 
     except HTTPException:
-        db.rollback()
         raise
     except Exception as e:
-        db.rollback()
         print(f"Error in refresh: {str(e)}")
         import traceback
 
@@ -345,21 +645,36 @@ async def refresh_countries():
             status_code=500,
             content={"error": "Internal server error", "details": str(e)},
         )
-    finally:
-        db.close()
 
 
 @app.get("/countries/image")
-async def get_summary_image():
+async def get_summary_image(request: Request):
     """Serve the generated summary image"""
-    image_path = "cache/summary.png"
+    image_path = Path("cache/summary.png")
 
-    if not os.path.exists(image_path):
+    try:
+        mtime_ns = image_path.stat().st_mtime_ns
+    except FileNotFoundError:
         return JSONResponse(
             status_code=404, content={"error": "Summary image not found"}
         )
 
-    return FileResponse(image_path, media_type="image/png")
+    entry = IMAGE_CACHE.get("summary")
+    if entry is None or entry[0] != mtime_ns:
+        async with IMAGE_RELOAD_LOCK:
+            entry = IMAGE_CACHE.get("summary")
+            if entry is None or entry[0] != mtime_ns:
+                loop = asyncio.get_running_loop()
+                data = await loop.run_in_executor(None, image_path.read_bytes)
+                entry = cache_summary_image(data, mtime_ns)
+
+    _, data, etag = entry
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=60"}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=data, media_type="image/png", headers=headers)
 
 
 @app.get("/countries")
@@ -367,144 +682,147 @@ async def get_countries(
     region: Optional[str] = Query(None),
     currency: Optional[str] = Query(None),
     sort: Optional[str] = Query(None),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
 ):
-    """Get all countries with optional filters and sorting"""
-    db = next(get_db())
-
-    try:
-        query = db.query(CountryModel)
-
-        # Apply filters
-        if region:
-            query = query.filter(func.lower(CountryModel.region) == region.lower())
-
-        if currency:
-            query = query.filter(
-                func.lower(CountryModel.currency_code) == currency.lower()
-            )
-
-        # Apply sorting
-        if sort == "gdp_desc":
-            query = query.order_by(CountryModel.estimated_gdp.desc())
-        elif sort == "gdp_asc":
-            query = query.order_by(CountryModel.estimated_gdp.asc())
-        elif sort == "name_asc":
-            query = query.order_by(CountryModel.name.asc())
-        elif sort == "name_desc":
-            query = query.order_by(CountryModel.name.desc())
-
-        countries = query.all()
-
-        # Convert to dict format
-        result = []
-        for country in countries:
-            result.append(
-                {
-                    "id": country.id,
-                    "name": country.name,
-                    "capital": country.capital,
-                    "region": country.region,
-                    "population": country.population,
-                    "currency_code": country.currency_code,
-                    "exchange_rate": country.exchange_rate,
-                    "estimated_gdp": country.estimated_gdp,
-                    "flag_url": country.flag_url,
-                    "last_refreshed_at": country.last_refreshed_at.isoformat()
-                    if country.last_refreshed_at
-                    else None,
-                }
-            )
-
-        return result
-
-    finally:
-        db.close()
+    """Get a page of countries with optional filters and sorting"""
+    key = cache_key("countries", region, currency, sort, skip, limit)
+    cached = get_cached(key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    stmt = select(*COUNTRY_FIELDS)
+
+    # Apply filters
+    if region:
+        stmt = stmt.where(func.lower(CountryModel.region) == region.lower())
+
+    if currency:
+        stmt = stmt.where(func.lower(CountryModel.currency_code) == currency.lower())
+
+    # Apply sorting
+    if sort == "gdp_desc":
+        stmt = stmt.order_by(CountryModel.estimated_gdp.desc())
+    elif sort == "gdp_asc":
+        stmt = stmt.order_by(CountryModel.estimated_gdp.asc())
+    elif sort == "name_asc":
+        stmt = stmt.order_by(CountryModel.name.asc())
+    elif sort == "name_desc":
+        stmt = stmt.order_by(CountryModel.name.desc())
+
+    # Tie-break on id so pages are stable
+    stmt = stmt.order_by(CountryModel.id).offset(skip).limit(limit)
+
+    # Execute before streaming so query errors still surface as a 500
+    rows = db.execute(stmt.execution_options(yield_per=200)).mappings()
+
+    def stream_rows():
+        """Encode rows as they are fetched, caching the full body once complete"""
+        chunks = [b"["]
+        yield chunks[0]
+        for i, row in enumerate(rows):
+            chunk = (b"," if i else b"") + orjson.dumps(dict(row))
+            chunks.append(chunk)
+            yield chunk
+        chunks.append(b"]")
+        yield chunks[-1]
+        set_cached(key, b"".join(chunks))
+
+    return StreamingResponse(stream_rows(), media_type="application/json")
 
 
 @app.get("/countries/{name}")
-async def get_country(name: str):
+async def get_country(name: str, db: Session = Depends(get_db)):
     """Get a single country by name"""
-    db = next(get_db())
-
-    try:
-        country = (
-            db.query(CountryModel)
-            .filter(func.lower(CountryModel.name) == name.lower())
-            .first()
-        )
-
-        if not country:
-            return JSONResponse(status_code=404, content={"error": "Country not found"})
-
-        return {
-            "id": country.id,
-            "name": country.name,
-            "capital": country.capital,
-            "region": country.region,
-            "population": country.population,
-            "currency_code": country.currency_code,
-            "exchange_rate": country.exchange_rate,
-            "estimated_gdp": country.estimated_gdp,
-            "flag_url": country.flag_url,
-            "last_refreshed_at": country.last_refreshed_at.isoformat()
-            if country.last_refreshed_at
-            else None,
-        }
+    key = cache_key("country", name.lower())
+    cached = get_cached(key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    country = db.execute(
+        select(CountryModel).where(func.lower(CountryModel.name) == name.lower())
+    ).scalars().first()
+
+    if not country:
+        return JSONResponse(status_code=404, content={"error": "Country not found"})
+
+    result = {
+        "id": country.id,
+        "name": country.name,
+        "capital": country.capital,
+        "region": country.region,
+        "population": country.population,
+        "currency_code": country.currency_code,
+        "exchange_rate": country.exchange_rate,
+        "estimated_gdp": country.estimated_gdp,
+        "flag_url": country.flag_url,
+        "last_refreshed_at": country.last_refreshed_at,
+    }
 
-    finally:
-        db.close()
+    response = ORJSONResponse(result)
+    set_cached(key, response.body)
+    return response
 
 
 @app.delete("/countries/{name}")
-async def delete_country(name: str):
+async def delete_country(name: str, db: Session = Depends(get_db)):
     """Delete a country by name"""
-    db = next(get_db())
+    country = db.execute(
+        select(CountryModel).where(func.lower(CountryModel.name) == name.lower())
+    ).scalars().first()
 
-    try:
-        country = (
-            db.query(CountryModel)
-            .filter(func.lower(CountryModel.name) == name.lower())
-            .first()
-        )
+    if not country:
+        return JSONResponse(status_code=404, content={"error": "Country not found"})
 
-        if not country:
-            return JSONResponse(status_code=404, content={"error": "Country not found"})
+    db.delete(country)
+    status = db.get(ApiStatus, API_STATUS_ID)
+    if status:
+        status.total_countries -= 1
+    db.commit()
+    invalidate()
 
-        db.delete(country)
-        db.commit()
-
-        return {"message": f"Country '{name}' deleted successfully"}
-
-    finally:
-        db.close()
+    return {"message": f"Country '{name}' deleted successfully"}
 
 
 @app.get("/status")
-async def get_status():
+async def get_status(db: Session = Depends(get_db)):
     """Get system status"""
-    db = next(get_db())
-
-    try:
-        total = db.query(CountryModel).count()
-        last_refresh = db.query(func.max(CountryModel.last_refreshed_at)).scalar()
+    key = cache_key("status")
+    cached = get_cached(key)
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+
+    status = db.get(ApiStatus, API_STATUS_ID)
+
+    if status:
+        total = status.total_countries
+        last_refresh = status.last_updated
+    else:
+        # Not refreshed since the status table was added, aggregate instead
+        total = db.execute(
+            select(func.count()).select_from(CountryModel)
+        ).scalar_one()
+        last_refresh = db.execute(
+            select(func.max(CountryModel.last_refreshed_at))
+        ).scalar()
+
+    result = {
+        "total_countries": total,
+        "last_refreshed_at": last_refresh,
+    }
 
-        return {
-            "total_countries": total,
-            "last_refreshed_at": last_refresh.isoformat() if last_refresh else None,
-        }
-
-    finally:
-        db.close()
+    response = ORJSONResponse(result)
+    set_cached(key, response.body)
+    return response
 
 
 @app.get("/health")
-async def health_check():
+async def health_check(db: Session = Depends(get_db)):
     """Health check endpoint to verify database connection"""
-    db = next(get_db())
-
     try:
         # Try to query the database
-        db.execute("SELECT 1")
+        db.execute(text("SELECT 1"))
         db_status = "connected"
         db_type = "PostgreSQL" if "postgresql" in DATABASE_URL else "SQLite"
     except Exception as e:
@@ -514,8 +832,6 @@ async def health_check():
             "status": "unhealthy",
             "database": {"status": db_status, "type": db_type, "error": str(e)},
         }
-    finally:
-        db.close()
 
     return {"status": "healthy", "database": {"status": db_status, "type": db_type}}
 
@@ -528,7 +844,7 @@ async def root():
         "endpoints": {
             "GET /health": "Health check and database status",
             "POST /countries/refresh": "Refresh country data",
-            "GET /countries": "Get all countries (supports ?region=, ?currency=, ?sort=)",
+            "GET /countries": "Get countries (supports ?region=, ?currency=, ?sort=, ?skip=, ?limit=)",
             "GET /countries/{name}": "Get country by name",
             "DELETE /countries/{name}": "Delete country",
             "GET /status": "Get system status",
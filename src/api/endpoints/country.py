@@ -1,6 +1,8 @@
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import ORJSONResponse, Response
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from src.database import get_db
@@ -11,6 +13,7 @@ from src.schemas import CountryResponse
 router = APIRouter(
     prefix="/countries",
     tags=["Countries"],
+    default_response_class=ORJSONResponse,
 )
 
 
@@ -35,11 +38,11 @@ def read_countries(
     Fetches country data, allowing for pagination, filtering by region, and dynamic sorting.
     [Image of World Map Globe]
     """
-    query = db.query(Country)
+    stmt = select(Country)
 
     # 1. Filter by Region (using ILIKE for case-insensitive partial match)
     if region:
-        query = query.filter(Country.region.ilike(f"%{region}%"))
+        stmt = stmt.where(Country.region.ilike(f"%{region}%"))
 
     # 2. Sorting Logic
     sort_column = None
@@ -53,19 +56,23 @@ def read_countries(
     if sort_column is not None:
         # Sort descending for numbers, ascending for strings
         if sort_by in ["population", "estimated_gdp"]:
-            query = query.order_by(sort_column.desc())
+            stmt = stmt.order_by(sort_column.desc())
         else:
-            query = query.order_by(sort_column.asc())
+            stmt = stmt.order_by(sort_column.asc())
 
     # 3. Pagination
-    countries = query.offset(skip).limit(limit).all()
+    countries = db.execute(stmt.offset(skip).limit(limit)).scalars().all()
 
     if not countries and skip > 0:
         raise HTTPException(
             status_code=404, detail="No more countries found in this range."
         )
 
-    return countries
+    # Rows are already JSON-encoded by the model; returning a Response skips re-validation
+    return Response(
+        content=b"[" + b",".join(c.to_json_bytes() for c in countries) + b"]",
+        media_type="application/json",
+    )
 
 
 @router.get(
@@ -78,11 +85,15 @@ def read_country_by_name(country_name: str, db: Session = Depends(get_db)):
     Fetches a single country's details based on its exact name (case-sensitive).
     """
     # Use ILIKE for a slightly more forgiving search
-    country = db.query(Country).filter(Country.name.ilike(country_name)).first()
+    country = (
+        db.execute(select(Country).where(Country.name.ilike(country_name)).limit(1))
+        .scalars()
+        .first()
+    )
 
     if country is None:
         raise HTTPException(
             status_code=404, detail=f"Country '{country_name}' not found"
         )
 
-    return country
+    return Response(content=country.to_json_bytes(), media_type="application/json")
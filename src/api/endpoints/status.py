@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from src.database import get_db
@@ -19,7 +20,9 @@ def read_status(db: Session = Depends(get_db)):
     by the refresh script.
     """
     # Based on the user's ApiStatus model (single-row table structure)
-    status_row = db.query(ApiStatus).order_by(ApiStatus.id).first()
+    status_row = (
+        db.execute(select(ApiStatus).order_by(ApiStatus.id).limit(1)).scalars().first()
+    )
 
     if status_row is None:
         # This occurs if the database is new and the refresh script has never successfully run
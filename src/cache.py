@@ -0,0 +1,38 @@
+import threading
+
+import cachetools
+
+from src.config import Config
+
+# Serialized read responses, cached until the TTL expires or the data is refreshed
+_cache = cachetools.TTLCache(maxsize=Config.cache_maxsize, ttl=Config.cache_ttl)
+# TTLCache isn't thread-safe and streamed responses populate it from worker threads
+_lock = threading.Lock()
+
+# Bumped on every write so entries computed before it can never be served
+_version = 0
+
+
+def cache_key(*parts):
+    """Build a cache key scoped to the current data version."""
+    return (_version, *parts)
+
+
+def get_cached(key):
+    """Return the cached value for key, or None on a miss."""
+    with _lock:
+        return _cache.get(key)
+
+
+def set_cached(key, value):
+    """Store value under key."""
+    with _lock:
+        _cache[key] = value
+
+
+def invalidate():
+    """Drop every cached response after the underlying data changed."""
+    global _version
+    with _lock:
+        _version += 1
+        _cache.clear()
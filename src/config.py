@@ -16,3 +16,5 @@ class Config:
         "EXCHANGE_RATE_API_URL", "https://open.er-api.com/v6/latest/USD"
     )
     cache_dir = os.getenv("CACHE_DIR", "cache")
+    cache_ttl = int(os.getenv("CACHE_TTL", "60"))
+    cache_maxsize = int(os.getenv("CACHE_MAXSIZE", "1024"))
@@ -5,6 +5,25 @@ from PIL import Image, ImageDraw, ImageFont
 from src.config import Config
 
 
+def _load_font(name, size):
+    """Load a TrueType font, falling back to Pillow's default if it isn't found."""
+    try:
+        return ImageFont.truetype(name, size)
+    except IOError:
+        return ImageFont.load_default()
+
+
+def _line_spacing(draw, font, pitch):
+    """Spacing that puts multiline_text lines `pitch` pixels apart."""
+    return pitch - draw.textbbox((0, 0), "A", font=font)[3]
+
+
+# Parsed once at import and reused for every render
+_FONT_LARGE = _load_font("arial.ttf", 24)
+_FONT_SMALL = _load_font("arial.ttf", 16)
+_FONT_MONO = _load_font("cour.ttf", 14)
+
+
 def generate_summary_image(total_count, top_5_countries, timestamp):
     """Generates and saves the cache/summary.png image."""
 
@@ -16,29 +35,18 @@ def generate_summary_image(total_count, top_5_countries, timestamp):
     img = Image.new("RGB", (600, 400), color=(30, 30, 70))
     d = ImageDraw.Draw(img)
 
-    try:
-        font_large = ImageFont.truetype("arial.ttf", 24)
-        font_small = ImageFont.truetype("arial.ttf", 16)
-        font_mono = ImageFont.truetype("cour.ttf", 14)
-    except IOError:
-        # Fallback if system fonts aren't found
-        font_large = ImageFont.load_default()
-        font_small = ImageFont.load_default()
-        font_mono = ImageFont.load_default()
+    font_large = _FONT_LARGE
+    font_small = _FONT_SMALL
+    font_mono = _FONT_MONO
 
     d.text((20, 20), "🌐 API Cache Summary", fill=(255, 200, 0), font=font_large)
 
-    d.text(
+    d.multiline_text(
         (20, 60),
-        f"Total Countries Cached: {total_count}",
-        fill=(200, 200, 255),
-        font=font_small,
-    )
-    d.text(
-        (20, 85),
-        "Last Successful Refresh (UTC):",
+        f"Total Countries Cached: {total_count}\nLast Successful Refresh (UTC):",
         fill=(200, 200, 255),
         font=font_small,
+        spacing=_line_spacing(d, font_small, 25),
     )
     d.text(
         (30, 110),
@@ -52,12 +60,21 @@ def generate_summary_image(total_count, top_5_countries, timestamp):
     d.text((20, y_pos), "Top 5 Estimated GDP:", fill=(255, 255, 255), font=font_small)
     y_pos += 25
 
+    lines = []
     for i, country in enumerate(top_5_countries):
         gdp_val = country.estimated_gdp
         gdp_str = f"${float(gdp_val):,.2f}" if gdp_val is not None else "N/A"
 
-        line = f"{i + 1}. {country.name.ljust(25)} {gdp_str}"
-        d.text((30, y_pos), line, fill=(255, 255, 255), font=font_mono)
-        y_pos += 20
+        lines.append(f"{i + 1}. {country.name.ljust(25)} {gdp_str}")
+
+    # One draw call for the whole list
+    d.multiline_text(
+        (30, y_pos),
+        "\n".join(lines),
+        fill=(255, 255, 255),
+        font=font_mono,
+        spacing=_line_spacing(d, font_mono, 20),
+    )
 
-    img.save(image_path)
+    # Fast zlib setting: the image is redrawn on every refresh
+    img.save(image_path, format="PNG", optimize=False, compress_level=1)
@@ -2,34 +2,89 @@ import os
 import random
 import time
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
-from datetime import datetime
+from functools import lru_cache
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 
 # --- 2. Database Setup (Self-Contained for Script Execution) ---
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine, delete, event, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateIndex
+from urllib3.util.retry import Retry
 
 # --- 1. Project-Specific Imports (Adjusted for Standalone Script) ---
 from src.config import Config
-from src.models import ApiStatus, Base, Country  # Base is needed for table creation
+from src.database import add_missing_columns
+from src.models import (  # Base is needed for table creation
+    API_STATUS_ID,
+    ApiStatus,
+    Base,
+    Country,
+    utc_now,
+)
 
 # Get the database URL from the config
 DATABASE_URL = Config.database_url
 
-# Create the engine, which manages connections
-engine = create_engine(DATABASE_URL)
 
-# Create the session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Use WAL with fewer fsyncs and a larger in-memory cache for bulk writes."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-64000")
+    cursor.close()
+
+
+@lru_cache(maxsize=1)
+def get_engine():
+    """Create the engine on first use rather than at import time."""
+    engine = create_engine(DATABASE_URL, insertmanyvalues_page_size=1000)
+    if engine.dialect.name == "sqlite":
+        event.listen(engine, "connect", set_sqlite_pragmas)
+    return engine
+
+
+@lru_cache(maxsize=1)
+def get_session_factory():
+    """Session factory bound to the lazily created engine."""
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+
+
+# Built once; the expanding "names" parameter keeps one cached compiled form
+EXISTING_COUNTRIES_STMT = select(
+    func.lower(Country.name), Country.id, Country.gdp_factor
+).where(func.lower(Country.name).in_(bindparam("names", expanding=True)))
+
+# Rows per upsert statement; keeps memory and bound parameters per statement bounded
+# (SQLite caps a statement at 32766 parameters)
+UPSERT_BATCH_SIZE = 1000
+
+# Shared HTTP session so connections are kept alive and reused between requests
+http_session = requests.Session()
+http_session.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=4,
+        max_retries=Retry(
+            total=3, backoff_factor=0.3, status_forcelist=(429, 500, 502, 503, 504)
+        ),
+    ),
+)
 
 
 @contextmanager
 def get_db_session():
     """Context manager for providing a database session."""
-    db_session = SessionLocal()
+    db_session = get_session_factory()()
     try:
         yield db_session
         db_session.commit()  # Commit on successful exit
@@ -48,31 +103,41 @@ def get_db_session():
 # --- 3. Core Logic Functions ---
 
 
-def fetch_external_data():
-    """Fetch exchange rates and country data from external APIs."""
-    print("Fetching external data...")
-    exchange_data = {}
-    countries_data = []
-
-    # Fetch exchange rates
+def fetch_exchange_rates():
+    """Fetch exchange rates, returning an empty dict on failure."""
     try:
-        exchange_response = requests.get(Config.exchange_rate_api_url, timeout=10)
+        exchange_response = http_session.get(Config.exchange_rate_api_url, timeout=10)
         exchange_response.raise_for_status()
-        exchange_data = exchange_response.json().get("rates", {})
+        exchange_data = orjson.loads(exchange_response.content).get("rates", {})
         print("Exchange rates fetched successfully.")
-    except requests.RequestException as e:
+        return exchange_data
+    except (requests.RequestException, orjson.JSONDecodeError) as e:
         print(f"ERROR: Failed to fetch exchange rates: {e}")
+        return {}
 
-    # Fetch countries data
+
+def fetch_countries_data():
+    """Fetch country data, returning an empty list on failure."""
     try:
-        countries_response = requests.get(Config.countries_api_url, timeout=10)
+        countries_response = http_session.get(Config.countries_api_url, timeout=10)
         countries_response.raise_for_status()
-        countries_data = countries_response.json()
+        countries_data = orjson.loads(countries_response.content)
         print(f"Countries data fetched successfully. ({len(countries_data)} records)")
-    except requests.RequestException as e:
+        return countries_data
+    except (requests.RequestException, orjson.JSONDecodeError) as e:
         print(f"ERROR: Failed to fetch countries data: {e}")
+        return []
+
+
+def fetch_external_data():
+    """Fetch exchange rates and country data from external APIs."""
+    print("Fetching external data...")
 
-    return exchange_data, countries_data
+    # The two requests are independent, so run them side by side
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        exchange_future = executor.submit(fetch_exchange_rates)
+        countries_future = executor.submit(fetch_countries_data)
+        return exchange_future.result(), countries_future.result()
 
 
 def process_and_save_countries(
@@ -87,21 +152,42 @@ def process_and_save_countries(
 
     print("Processing and saving country records...")
 
+    # Load existing countries in one query instead of one SELECT per record.
+    # Names are matched case-insensitively, like the unique lower(name) index.
+    names = [country_info.get("name", "").lower() for country_info in countries_data]
+    existing = db_session.execute(EXISTING_COUNTRIES_STMT, {"names": names}).all()
+    existing_ids = {name: country_id for name, country_id, _ in existing}
+    gdp_factors = {name: gdp_factor for name, _, gdp_factor in existing}
+
+    # Rows are collected and written in bulk after the loop (keyed to collapse duplicates)
+    rows = {}
+
+    # Bound once rather than looked up on every record
+    rand = random.random
+    rates_get = exchange_data.get
+
     for country_info in countries_data:
         country_name = country_info.get("name")
+        name_key = country_name.lower()
         population = country_info.get("population")
 
-        currency_code = None
-        if country_info.get("currencies") and country_info["currencies"]:
-            currency_code = country_info["currencies"][0].get("code")
+        currencies = country_info.get("currencies")
+        currency_code = currencies[0].get("code") if currencies else None
 
         # Default to 1.0 (USD) if rate is missing
-        exchange_rate = exchange_data.get(currency_code, 1.0)
+        exchange_rate = rates_get(currency_code, 1.0)
+
+        # Reuse the country's multiplier so unchanged inputs give an unchanged GDP;
+        # draw one only for new countries (or rows that predate the column)
+        gdp_factor = gdp_factors.get(name_key)
+        if gdp_factor is None:
+            # 0.5 + random() is uniform over [0.5, 1.5) without uniform()'s bound arithmetic
+            gdp_factor = 0.5 + rand()
 
         estimated_gdp = None
         if exchange_rate and population is not None:
             # Using the simplified GDP calculation from the provided snippet
-            estimated_gdp = population * exchange_rate * random.uniform(0.5, 1.5)
+            estimated_gdp = population * exchange_rate * gdp_factor
 
         # Build the Country object fields
         country_fields = {
@@ -112,49 +198,99 @@ def process_and_save_countries(
             "region": country_info.get("region"),
             "exchange_rate": exchange_rate,
             "estimated_gdp": estimated_gdp,
+            "gdp_factor": gdp_factor,
             "flag_url": country_info.get("flag"),
-            # Ensure we pass the ISO string since the model column type is String
-            "last_refreshed_at": current_refresh_time.isoformat(),
+            "last_refreshed_at": current_refresh_time,
         }
 
-        existing_country = (
-            db_session.query(Country).filter(Country.name == country_name).first()
-        )
+        # A name repeated in the payload is one row, so count it only once
+        if name_key not in rows:
+            if name_key in existing_ids:
+                updates_count += 1
+            else:
+                insert_count += 1
+        rows[name_key] = country_fields
 
-        if existing_country:
-            # Update existing record
-            for key, value in country_fields.items():
-                setattr(existing_country, key, value)
-            updates_count += 1
-        else:
-            # Insert new record
-            new_country = Country(**country_fields)
-            db_session.add(new_country)
-            insert_count += 1
+    upsert_countries(db_session, list(rows.values()), existing_ids)
 
     return updates_count, insert_count
 
 
-def update_global_status(db_session, refresh_time):
+def upsert_countries(db_session, rows, existing_ids):
     """
-    Update the global API status (timestamp only) in the database,
-    matching the user's ApiStatus model (id, last_updated).
+    Write country rows in a single INSERT ... ON CONFLICT (lower(name)) DO UPDATE.
+    Dialects without native upsert fall back to a bulk INSERT plus a bulk UPDATE by id.
+    """
+    if not rows:
+        return
+
+    dialect = db_session.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            stmt = dialect_insert(Country).values(
+                rows[start : start + UPSERT_BATCH_SIZE]
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[func.lower(Country.name)],
+                set_={
+                    column.name: stmt.excluded[column.name]
+                    for column in Country.__table__.columns
+                    if column.name not in ("id", "name")
+                },
+            )
+            db_session.execute(stmt)
+        return
+
+    new_rows = [row for row in rows if row["name"].lower() not in existing_ids]
+    update_rows = [
+        {"id": existing_ids[row["name"].lower()], **row}
+        for row in rows
+        if row["name"].lower() in existing_ids
+    ]
+    for start in range(0, len(new_rows), UPSERT_BATCH_SIZE):
+        db_session.execute(insert(Country), new_rows[start : start + UPSERT_BATCH_SIZE])
+    for start in range(0, len(update_rows), UPSERT_BATCH_SIZE):
+        db_session.bulk_update_mappings(
+            Country, update_rows[start : start + UPSERT_BATCH_SIZE]
+        )
+
+
+def ensure_unique_country_names(engine):
+    """
+    The upsert conflicts on the unique lower(name) index, which create_all() does not
+    add to an existing countries table. Remove case-insensitive duplicates (keeping the
+    oldest row per name, a no-op once the index exists) and create it if missing.
+    """
+    with engine.begin() as conn:
+        conn.execute(
+            delete(Country).where(
+                Country.id.not_in(
+                    select(func.min(Country.id)).group_by(func.lower(Country.name))
+                )
+            )
+        )
+        for index in Country.__table__.indexes:
+            conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def update_global_status(db_session, refresh_time, total_countries):
+    """
+    Update the global API status (timestamp and country count) in the database.
+    The API reads and writes the same row (API_STATUS_ID), so both stay in step.
     """
     print("Updating API status record...")
 
-    # Try to find the single status row (often ID 1 for single-row tables)
-    status_row = db_session.query(ApiStatus).order_by(ApiStatus.id).first()
+    status_row = db_session.get(ApiStatus, API_STATUS_ID)
 
     if not status_row:
         # If no row exists, create it
-        status_row = ApiStatus(
-            # No need to set ID, it's auto-incrementing
-            last_updated=refresh_time.isoformat()
-        )
+        status_row = ApiStatus(id=API_STATUS_ID)
         db_session.add(status_row)
-    else:
-        # If a row exists, update its timestamp
-        status_row.last_updated = refresh_time.isoformat()
+
+    status_row.last_updated = refresh_time
+    status_row.total_countries = total_countries
 
 
 def refresh_main():
@@ -182,7 +318,10 @@ def refresh_main():
                 "it means your table schema is outdated. Please DELETE this file and rerun the script."
             )
 
-        Base.metadata.create_all(bind=engine)
+        Base.metadata.create_all(bind=get_engine())
+        add_missing_columns(get_engine(), Country.__table__)
+        add_missing_columns(get_engine(), ApiStatus.__table__)
+        ensure_unique_country_names(get_engine())
         print("Tables checked/created successfully.")
     except Exception as e:
         print(
@@ -198,7 +337,7 @@ def refresh_main():
         return
 
     external_country_count = len(countries_data)
-    current_refresh_time = datetime.utcnow()
+    current_refresh_time = utc_now()
 
     updates = 0
     inserts = 0
@@ -211,18 +350,20 @@ def refresh_main():
                 db_session, exchange_data, countries_data, current_refresh_time
             )
 
-            # Update status records after country data has been processed (only passes timestamp)
-            update_global_status(db_session, current_refresh_time)
-
             # Query the final count directly from the Country table
-            total_countries = db_session.query(Country).count()
+            total_countries = db_session.execute(
+                select(func.count()).select_from(Country)
+            ).scalar_one()
+
+            # Update status records after country data has been processed
+            update_global_status(db_session, current_refresh_time, total_countries)
 
         end_time = time.time()
         print("\nSUCCESS: Data refresh complete.")
         print(f"-> Countries updated: {updates}")
         print(f"-> Countries inserted: {inserts}")
         print(f"-> Total Countries in database: {total_countries}")
-        print(f"-> Last refresh time: {current_refresh_time.isoformat()}")
+        print(f"-> Last refresh time: {current_refresh_time.isoformat()}Z")
         print(f"Total time taken: {end_time - start_time:.2f} seconds.")
 
     except Exception as e:
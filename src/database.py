@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+from functools import lru_cache
+
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
@@ -6,18 +8,57 @@ from src.config import Config
 
 SQLALCHEMY_DATABASE_URL = Config.database_url
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+Base = declarative_base()
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
+@lru_cache(maxsize=1)
+def get_engine():
+    """Create the engine on first use rather than at import time."""
+    return create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        query_cache_size=1200,
+    )
+
+
+@lru_cache(maxsize=1)
+def get_session_factory():
+    """Session factory bound to the lazily created engine."""
+    return sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
 
 
 def get_db():
-    db = SessionLocal()
+    db = get_session_factory()()
     try:
         yield db
     finally:
         db.close()
+
+
+def add_missing_columns(bind, table):
+    """
+    Add columns defined on the model but missing from an existing table, returning
+    their names. create_all() skips tables that already exist, so new columns need this.
+    """
+    existing = {column["name"] for column in inspect(bind).get_columns(table.name)}
+    preparer = bind.dialect.identifier_preparer
+    added = []
+
+    with bind.begin() as conn:
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = (
+                f"ALTER TABLE {preparer.format_table(table)} "
+                f"ADD COLUMN {preparer.format_column(column)} "
+                f"{column.type.compile(dialect=bind.dialect)}"
+            )
+            # Existing rows need a value, so NOT NULL is only safe with a default
+            if column.server_default is not None:
+                ddl += f" DEFAULT {column.server_default.arg}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            conn.execute(text(ddl))
+            added.append(column.name)
+
+    return added
@@ -1,24 +1,36 @@
-from datetime import datetime
+from datetime import datetime, timezone
 
-from sqlalchemy import Column, Float, Integer, String
+import orjson
+from sqlalchemy import Column, DateTime, Float, Index, Integer, String, func
 
 from src.database import Base
 
 
+# Timestamps are stored as naive UTC: aware values in a naive column are shifted by
+# the session time zone on PostgreSQL
+def utc_now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class Country(Base):
     __tablename__ = "countries"
 
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True, nullable=False)
+    id = Column(Integer, primary_key=True)
+    name = Column(String, unique=True, index=True, nullable=False)
     population = Column(Integer, nullable=False)
     currency_code = Column(String, nullable=True)
     capital = Column(String, nullable=True)
     region = Column(String, nullable=True)
     exchange_rate = Column(Float, nullable=True)
     estimated_gdp = Column(Float, nullable=True)
+    # Random GDP multiplier drawn once per country, so refreshes stay deterministic
+    gdp_factor = Column(Float, nullable=True)
     flag_url = Column(String, nullable=True)
-    last_refreshed_at = Column(
-        String, default=datetime.utcnow().isoformat(), nullable=False
+    last_refreshed_at = Column(DateTime, default=utc_now, nullable=False)
+
+    __table_args__ = (
+        # Case-insensitive uniqueness, shared with main.py; the ON CONFLICT target
+        Index("ix_countries_lower_name", func.lower(name), unique=True),
     )
 
     def to_dict(self):
@@ -40,9 +52,33 @@ class Country(Base):
             "last_refreshed_at": self.last_refreshed_at.isoformat() + "Z",
         }
 
+    def to_json_bytes(self):
+        # Same fields as to_dict, encoded by orjson in one pass (datetime as UTC "Z")
+        return orjson.dumps(
+            {
+                "id": self.id,
+                "name": self.name,
+                "capital": self.capital,
+                "region": self.region,
+                "population": self.population,
+                "currency_code": self.currency_code,
+                "exchange_rate": self.exchange_rate,
+                "estimated_gdp": self.estimated_gdp,
+                "flag_url": self.flag_url,
+                "last_refreshed_at": self.last_refreshed_at,
+            },
+            option=orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z,
+        )
+
+
+# Single-row table; the refresh script and main.py both write row API_STATUS_ID
+API_STATUS_ID = 1
+
 
 class ApiStatus(Base):
     __tablename__ = "api_status"
 
-    id = Column(Integer, primary_key=True, index=True)
-    last_updated = Column(String, default=datetime.utcnow().isoformat(), nullable=False)
+    id = Column(Integer, primary_key=True)
+    last_updated = Column(DateTime, default=utc_now, nullable=False)
+    # Country count as of the last write, so status reads are a primary-key lookup
+    total_countries = Column(Integer, default=0, server_default="0", nullable=False)
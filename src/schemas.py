@@ -4,10 +4,10 @@ from typing import Optional
 from pydantic import BaseModel, Field
 
 
-# --- Helper Schema for consistent String datetime handling ---
+# --- Helper Schema for consistent datetime handling ---
 class TimeStampMixin(BaseModel):
-    # Matches the Column(String) type used in the SQLAlchemy models
-    last_refreshed_at: str | datetime = Field(..., example="2025-10-27T10:00:00.000000")
+    # Matches the Column(DateTime) type used in the SQLAlchemy models
+    last_refreshed_at: datetime = Field(..., example="2025-10-27T10:00:00.000000")
 
 
 class CountryBase(BaseModel):
@@ -32,7 +32,7 @@ class CountryResponse(CountryBase, TimeStampMixin):
 class Status(BaseModel):
     # Schema for the ApiStatus model (id and last_updated)
     id: int
-    last_updated: str = Field(..., example="2025-10-27T10:00:00.000000")
+    last_updated: datetime = Field(..., example="2025-10-27T10:00:00.000000")
 
     class Config:
         from_attributes = True
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def import_app(database_url: str, cwd: Path) -> subprocess.CompletedProcess:
+    """Import main.py in a fresh interpreter against the given database"""
+    env = {**os.environ, "DATABASE_URL": database_url, "PYTHONPATH": str(ROOT)}
+    return subprocess.run(
+        [sys.executable, "-c", "import main"],
+        cwd=cwd,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+
+def test_app_imports_against_fresh_sqlite_database(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'countries.db'}"
+
+    # First import creates the schema, the second runs against the existing one
+    for _ in range(2):
+        result = import_app(database_url, tmp_path)
+        assert result.returncode == 0, result.stderr